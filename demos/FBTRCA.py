@@ -1,4 +1,8 @@
+import os
+import inspect
 import numpy as np
+from joblib import Memory, Parallel, delayed
+from sklearn.base import clone
 from davidbci.brainda.datasets import Wang2016
 from davidbci.brainda.paradigms import SSVEP
 from davidbci.brainda.algorithms.utils.model_selection import (
@@ -13,6 +17,8 @@ wp=[(5,90),(14,90),(22,90),(30,90),(38,90)]
 ws=[(3,92),(12,92),(20,92),(28,92),(36,92)]
 
 filterbank = generate_filterbank(wp,ws,srate=250,order=15,rp=0.5)
+filterbank = [np.ascontiguousarray(sos) for sos in filterbank]
+assert all(sos.ndim == 2 and sos.shape[1] == 6 for sos in filterbank)
 
 dataset = Wang2016()
 
@@ -27,7 +33,8 @@ paradigm = SSVEP(
 def raw_hook(raw, caches):
     # do something with raw object
     raw.filter(5, 90, l_trans_bandwidth=2,h_trans_bandwidth=5,
-        phase='zero-double')
+        method='fir', fir_design='firwin', phase='zero-double',
+        pad='reflect_limited', n_jobs=-1)
     caches['raw_stage'] = caches.get('raw_stage', -1) + 1
     return raw, caches
 
@@ -51,12 +58,43 @@ paradigm.register_raw_hook(raw_hook)
 paradigm.register_epochs_hook(epochs_hook)
 paradigm.register_data_hook(data_hook)
 
-X, y, david = paradigm.get_data(
-    dataset,
-    subjects=[1],
-    return_concat=True,
-    n_jobs=None,
-    verbose=False)
+# optionally cache the epoched data on disk, set DAVIDBCI_CACHE_DIR to enable it;
+# warm runs then skip loading, filtering and epoching. The paradigm object itself
+# is not hashed, paradigm_key() below stands in for it. Changes outside that key
+# (e.g. to the library or dataset code) are not detected, clear the cache
+# directory by hand after such changes. Without the variable, nothing is cached.
+memory = Memory(os.environ.get('DAVIDBCI_CACHE_DIR'), mmap_mode='r', verbose=0)
+
+
+def paradigm_key(paradigm):
+    # the paradigm settings that affect get_data, plus the source of the hooks
+    # registered above at each stage
+    return {
+        'class': type(paradigm).__module__ + '.' + type(paradigm).__qualname__,
+        'channels': paradigm.select_channels,
+        'events': paradigm.event_list,
+        'intervals': paradigm.intervals,
+        'srate': paradigm.srate,
+        'hooks': {
+            'raw': inspect.getsource(raw_hook),
+            'epochs': inspect.getsource(epochs_hook),
+            'data': inspect.getsource(data_hook),
+        },
+    }
+
+
+def get_data(paradigm, dataset, subjects, key):
+    # key is unused here, it only exists so that joblib hashes it
+    return paradigm.get_data(
+        dataset,
+        subjects=subjects,
+        return_concat=True,
+        n_jobs=None,
+        verbose=False)
+
+
+get_data_cached = memory.cache(get_data, ignore=['paradigm'])
+X, y, david = get_data_cached(paradigm, dataset, [1], paradigm_key(paradigm))
 
 # 6-fold cross validation
 set_random_seeds(38)
@@ -67,15 +105,30 @@ indices = generate_kfold_indices(david, kfold=kfold)
 filterweights = [(idx_filter+1) ** (-1.25) + 0.25 for idx_filter in range(5)]
 estimator = FBTRCA(filterbank=filterbank,n_components = 1, ensemble = True,filterweights=np.array(filterweights), n_jobs=-1)
 
+# the filterbank works trial by trial, so filter the whole dataset once
+# instead of once per fold, shape (n_bands, n_trials, n_channels, n_samples)
+X_fb = estimator.transform_filterbank(X)
 
-accs = []
+
+# data and indices are passed as arguments so joblib can memmap X_fb once
+# for all workers instead of pickling it with the function for every task
+def run_fold(estimator, X_fb, y, train_ind, test_ind):
+    est = clone(estimator)
+    est.fit_prefiltered(X_fb[:, train_ind], y[train_ind])
+    p_labels = est.predict_prefiltered(X_fb[:, test_ind])
+    return np.mean(p_labels==y[test_ind])
+
+
+folds = []
 for k in range(kfold):
     train_ind, validate_ind, test_ind = match_kfold_indices(k, david, indices)
     # merge train and validate set
     train_ind = np.concatenate((train_ind, validate_ind))
-    p_labels = estimator.fit(X[train_ind], y[train_ind]).predict(X[test_ind])
+    folds.append((train_ind, test_ind))
 
-    accs.append(np.mean(p_labels==y[test_ind]))
+accs = Parallel(n_jobs=kfold, backend='loky')(
+    delayed(run_fold)(estimator, X_fb, y, train_ind, test_ind)
+    for train_ind, test_ind in folds)
 print(np.mean(accs))
 # If everything is fine, you will get the accuracy about 0.9417.
 
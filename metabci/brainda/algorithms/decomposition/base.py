@@ -6,6 +6,7 @@
 
 
 from typing import Optional, List, Tuple, Union
+from functools import lru_cache
 import warnings
 import numpy as np
 from numpy import ndarray
@@ -100,12 +101,15 @@ class FilterBank(BaseEstimator, TransformerMixin):
         Yf : None
             Reference signal (ibid., ignorable).
         """
+        X = self.transform_filterbank(X)
+        return self._fit_subbands(X, y, **kwargs)
+
+    def _fit_subbands(self, Xs: ndarray, y: Optional[ndarray] = None, **kwargs):
         self.estimators_ = [
             clone(self.base_estimator) for _ in range(len(self.filterbank))
         ]
-        X = self.transform_filterbank(X)
         for i, est in enumerate(self.estimators_):
-            est.fit(X[i], y, **kwargs)
+            est.fit(Xs[i], y, **kwargs)
         # def wrapper(est, X, y, kwargs):
         #     est.fit(X, y, **kwargs)
         #     return est
@@ -132,7 +136,10 @@ class FilterBank(BaseEstimator, TransformerMixin):
             Feature array.
         """
         X = self.transform_filterbank(X)
-        feat = [est.transform(X[i], **kwargs) for i, est in enumerate(self.estimators_)]
+        return self._transform_subbands(X, **kwargs)
+
+    def _transform_subbands(self, Xs: ndarray, **kwargs):
+        feat = [est.transform(Xs[i], **kwargs) for i, est in enumerate(self.estimators_)]
         # def wrapper(est, X, kwargs):
         #     retval = est.transform(X, **kwargs)
         #     return retval
@@ -212,6 +219,9 @@ class FilterBankSSVEP(FilterBank):
             Feature array.
         """
         features = super().transform(X)
+        return self._weight_features(features)
+
+    def _weight_features(self, features: ndarray):
         if self.filterweights is None:
             return features
         else:
@@ -570,6 +580,25 @@ def generate_filterbank(
     Filterbank：ndarray, shape(len(passbands), N, 6)
         Filter bank coefficient.
     """
+    filterbank = _generate_filterbank_cached(
+        tuple(tuple(wp) for wp in passbands),
+        tuple(tuple(ws) for ws in stopbands),
+        srate,
+        order,
+        rp,
+    )
+    # copy out so callers can not modify the cached coefficients
+    return [sos.copy() for sos in filterbank]
+
+
+@lru_cache(maxsize=8)
+def _generate_filterbank_cached(
+    passbands: Tuple[Tuple[float, ...], ...],
+    stopbands: Tuple[Tuple[float, ...], ...],
+    srate: int,
+    order: Optional[int],
+    rp: float,
+) -> Tuple[ndarray, ...]:
     filterbank = []
     for wp, ws in zip(passbands, stopbands):
         if order is None:
@@ -579,7 +608,7 @@ def generate_filterbank(
             sos = cheby1(order, rp, wp, btype="bandpass", output="sos", fs=srate)
 
         filterbank.append(sos)
-    return filterbank
+    return tuple(filterbank)
 
 
 def generate_cca_references(
@@ -1704,13 +1704,16 @@ def _trca_kernel(X: ndarray):
     ----------
     X: (n_trials, n_channels, n_samples)
     """
-    X = np.reshape(X, (-1, *X.shape[-2:]))
-    M, C, N = X.shape
-    n_components = C
-    P = vstack([identity(N) for _ in range(M)])
-    P = P @ P.T
-    Z = np.hstack(X).T  # type: ignore
-    _, U = _ged_wong(Z, None, P, n_components=n_components)  # U for X
+    # solve the eigenproblem in float64 whatever the input precision
+    X = np.reshape(X, (-1, *X.shape[-2:])).astype(np.float64, copy=False)
+    # sum_{i,j} X_i X_j^T equals (sum_i X_i)(sum_i X_i)^T, no need for the
+    # (M*N, M*N) block projection over concatenated trials
+    X_sum = np.sum(X, axis=0)
+    S = X_sum @ X_sum.T
+    Q = np.einsum("mcn,mdn->cd", X, X, optimize=True)
+    D, U = eigh(S, Q)
+    ind = np.argsort(D)[::-1]
+    U = U[:, ind]  # U for X
     return U
 
 
@@ -1943,6 +1946,22 @@ class FBTRCA(FilterBankSSVEP, ClassifierMixin):
         super().fit(X, y, Yf=Yf)
         return self
 
+    def fit_prefiltered(self, Xs: ndarray, y: ndarray, Yf: Optional[ndarray] = None):
+        """model train with data already filtered by transform_filterbank
+
+        Parameters
+        ----------
+        Xs: ndarray
+            Subband EEG data, shape(Nfb, n_trials, n_channels, n_samples).
+        y: ndarray
+            Labels, shape(n_trials,)
+        Yf: ndarray
+            Reference signal, shape(n_classes, 2*n_harmonics, n_samples)
+        """
+        self.classes_ = np.unique(y)
+        self._fit_subbands(Xs, y, Yf=Yf)
+        return self
+
     def predict(self, X: ndarray):
         """Predict the labels
 
@@ -1956,7 +1975,22 @@ class FBTRCA(FilterBankSSVEP, ClassifierMixin):
         labels: ndarray
             Predicting labels, shape(n_trials,).
         """
-        features = self.transform(X)
+        return self.predict_prefiltered(self.transform_filterbank(X))
+
+    def predict_prefiltered(self, Xs: ndarray):
+        """Predict the labels of data already filtered by transform_filterbank
+
+        Parameters
+        ----------
+        Xs: ndarray
+            Subband EEG data, shape(Nfb, n_trials, n_channels, n_samples).
+
+        Returns
+        ----------
+        labels: ndarray
+            Predicting labels, shape(n_trials,).
+        """
+        features = self._weight_features(self._transform_subbands(Xs))
         if self.filterweights is None:
             features = np.reshape(
                 features, (features.shape[0], len(self.filterbank), -1)
@@ -7,6 +7,7 @@
 High-gamma dataset.
 """
 import re
+from functools import lru_cache
 from typing import Union, Optional, Dict, List
 from pathlib import Path
 import warnings
@@ -21,6 +22,17 @@ from ..utils.channels import upper_ch_names
 
 GIN_URL = "https://web.gin.g-node.org/robintibor/high-gamma-dataset/raw/master/data"
 
+# prefixes of non-EEG sensors in the BBCI files
+_NONEEG_RE = re.compile(r"^(BIP|E|Microphone|Breath|GSR)")
+
+
+@lru_cache(maxsize=None)
+def _get_upper_montage():
+    # identical for every subject and run, build it once on first use
+    montage = make_standard_montage("standard_1005")
+    montage.rename_channels({ch_name: ch_name.upper() for ch_name in montage.ch_names})
+    return montage
+
 
 class Schirrmeister2017(BaseDataset):
     """High-gamma dataset discribed in Schirrmeister et al. 2017
@@ -242,11 +254,7 @@ class Schirrmeister2017(BaseDataset):
     ) -> Dict[str, Dict[str, Raw]]:
         dests = self.data_path(subject)
 
-        montage = make_standard_montage("standard_1005")
-        montage.rename_channels(
-            {ch_name: ch_name.upper() for ch_name in montage.ch_names}
-        )
-        # montage.ch_names = [ch_name.upper() for ch_name in montage.ch_names]
+        montage = _get_upper_montage()
 
         sess = dict()
         for isess, run_dests in enumerate(dests):
@@ -282,28 +290,26 @@ class BBCIDataset(object):
         del self.self
 
     def load(self):
-        cnt = self._load_continuous_signal()
-        cnt = self._add_markers(cnt)
+        # open the file once and share the handle with all helpers
+        with h5py.File(self.filename, "r") as h5file:
+            cnt = self._load_continuous_signal(h5file)
+            cnt = self._add_markers(cnt, h5file)
         return cnt
 
-    def _load_continuous_signal(self):
-        wanted_chan_inds, wanted_sensor_names = self._determine_sensors()
-        fs = self._determine_samplingrate()
-        with h5py.File(self.filename, "r") as h5file:
-            samples = int(h5file["nfo"]["T"][0, 0])
-            cnt_signal_shape = (samples, len(wanted_chan_inds))
-            continuous_signal = np.ones(cnt_signal_shape, dtype=np.float32) * np.nan
-            for chan_ind_arr, chan_ind_set in enumerate(wanted_chan_inds):
-                # + 1 because matlab/this hdf5-naming logic
-                # has 1-based indexing
-                # i.e ch1,ch2,....
-                chan_set_name = "ch" + str(chan_ind_set + 1)
-                # first 0 to unpack into vector, before it is 1xN matrix
-                chan_signal = h5file[chan_set_name][
-                    :
-                ].squeeze()  # already load into memory
-                continuous_signal[:, chan_ind_arr] = chan_signal
-            assert not np.any(np.isnan(continuous_signal)), "No NaNs expected in signal"
+    def _load_continuous_signal(self, h5file):
+        wanted_chan_inds, wanted_sensor_names = self._determine_sensors(h5file)
+        fs = self._determine_samplingrate(h5file)
+        samples = int(h5file["nfo"]["T"][0, 0])
+        continuous_signal = np.empty(
+            (len(wanted_chan_inds), samples), dtype=np.float32
+        )
+        for chan_ind_arr, chan_ind_set in enumerate(wanted_chan_inds):
+            # + 1 because matlab/this hdf5-naming logic
+            # has 1-based indexing
+            # i.e ch1,ch2,....
+            chan_set_name = "ch" + str(chan_ind_set + 1)
+            # stored as 1xN matrix, flatten straight into the buffer row
+            continuous_signal[chan_ind_arr, :] = h5file[chan_set_name][:].reshape(-1)
 
         # Assume we cant know channel type here automatically
         ch_types = ["eeg"] * len(wanted_chan_inds)
@@ -311,30 +317,20 @@ class BBCIDataset(object):
             ch_names=wanted_sensor_names, sfreq=fs, ch_types=ch_types
         )
         # Scale to volts from microvolts, (VJ 19.6.18)
-        continuous_signal = continuous_signal * 1e-6
-        cnt = mne.io.RawArray(continuous_signal.T, info)
+        continuous_signal *= np.float32(1e-6)
+        # channel-major buffer matches RawArray's (n_channels, n_samples) layout,
+        # RawArray still makes one float64 copy of it
+        cnt = mne.io.RawArray(continuous_signal, info)
         return cnt
 
-    def _determine_sensors(self):
-        all_sensor_names = self.get_all_sensors(self.filename, pattern=None)
+    def _determine_sensors(self, h5file):
+        all_sensor_names = self._read_sensor_names(h5file, pattern=None)
         if self.load_sensor_names is None:
 
             # if no sensor names given, take all EEG-chans
-            eeg_sensor_names = all_sensor_names
-            eeg_sensor_names = filter(
-                lambda s: not s.startswith("BIP"), eeg_sensor_names
-            )
-            eeg_sensor_names = filter(lambda s: not s.startswith("E"), eeg_sensor_names)
-            eeg_sensor_names = filter(
-                lambda s: not s.startswith("Microphone"), eeg_sensor_names
-            )
-            eeg_sensor_names = filter(
-                lambda s: not s.startswith("Breath"), eeg_sensor_names
-            )
-            eeg_sensor_names = filter(
-                lambda s: not s.startswith("GSR"), eeg_sensor_names
-            )
-            eeg_sensor_names = list(eeg_sensor_names)
+            eeg_sensor_names = [
+                s for s in all_sensor_names if not _NONEEG_RE.match(s)
+            ]
             assert len(eeg_sensor_names) in set(
                 [128, 64, 32, 16]
             ), "check this code if you have different sensors..."  # noqa
@@ -342,17 +338,21 @@ class BBCIDataset(object):
         chan_inds = self._determine_chan_inds(all_sensor_names, self.load_sensor_names)
         return chan_inds, self.load_sensor_names
 
-    def _determine_samplingrate(self):
-        with h5py.File(self.filename, "r") as h5file:
-            fs = h5file["nfo"]["fs"][0, 0]
-            assert isinstance(fs, int) or fs.is_integer()
-            fs = int(fs)
+    @staticmethod
+    def _determine_samplingrate(h5file):
+        fs = h5file["nfo"]["fs"][0, 0]
+        assert isinstance(fs, int) or fs.is_integer()
+        fs = int(fs)
         return fs
 
     @staticmethod
     def _determine_chan_inds(all_sensor_names, sensor_names):
         assert sensor_names is not None
-        chan_inds = [all_sensor_names.index(s) for s in sensor_names]
+        name_to_ind = dict()
+        for i, name in enumerate(all_sensor_names):
+            # keep the first occurrence, like list.index
+            name_to_ind.setdefault(name, i)
+        chan_inds = [name_to_ind[s] for s in sensor_names]
         assert len(chan_inds) == len(sensor_names), "All" "sensors" "should be there."
         # TODO: is it possible for this to fail? the list
         # comp fails first right?
@@ -378,71 +378,72 @@ class BBCIDataset(object):
             sensor names in the file.
         """
         with h5py.File(filename, "r") as h5file:
-            clab_set = h5file["nfo"]["clab"][:].squeeze()
-            all_sensor_names = [
-                "".join(chr(c.squeeze()) for c in h5file[obj_ref])
-                for obj_ref in clab_set
-            ]
-            if pattern is not None:
-                all_sensor_names = filter(
-                    lambda sname: re.search(pattern, sname), all_sensor_names
-                )
+            all_sensor_names = BBCIDataset._read_sensor_names(h5file, pattern)
         return all_sensor_names
 
-    def _add_markers(self, cnt):
-        with h5py.File(self.filename, "r") as h5file:
-            event_times_in_ms = h5file["mrk"]["time"][:].squeeze()
-            event_classes = h5file["mrk"]["event"]["desc"][:].squeeze().astype(np.int64)
+    @staticmethod
+    def _read_sensor_names(h5file, pattern=None):
+        clab_set = h5file["nfo"]["clab"][:].squeeze()
+        # matlab stores chars as uint16 codes, decode each name losslessly in one go
+        all_sensor_names = [
+            h5file[obj_ref][:].ravel().astype("<u2").tobytes().decode("utf-16-le")
+            for obj_ref in clab_set
+        ]
+        if pattern is not None:
+            all_sensor_names = filter(
+                lambda sname: re.search(pattern, sname), all_sensor_names
+            )
+        return all_sensor_names
 
-            # Check whether class names known and correct order
-            # class_name_set = h5file['nfo']['className'][:].squeeze()
-            # all_class_names = [''.join(chr(c) for c in h5file[obj_ref])
-            #                    for obj_ref in class_name_set]
+    def _add_markers(self, cnt, h5file):
+        event_times_in_ms = h5file["mrk"]["time"][:].squeeze()
+        event_classes = h5file["mrk"]["event"]["desc"][:].squeeze().astype(np.int64)
 
-        event_times_in_samples = event_times_in_ms * cnt.info["sfreq"] / 1000.0
-        event_times_in_samples = np.uint32(np.round(event_times_in_samples))
+        # Check whether class names known and correct order
+        # class_name_set = h5file['nfo']['className'][:].squeeze()
+        # all_class_names = [''.join(chr(c) for c in h5file[obj_ref])
+        #                    for obj_ref in class_name_set]
+
+        event_times_in_samples = np.multiply(event_times_in_ms, cnt.info["sfreq"] / 1000.0)
+        np.rint(event_times_in_samples, out=event_times_in_samples)
+        event_times_in_samples = event_times_in_samples.astype(np.uint32, copy=False)
 
         # Check if there are markers at the same time
-        previous_i_sample = -1
-        for i_event, (i_sample, id_class) in enumerate(
-            zip(event_times_in_samples, event_classes)
-        ):
-            if i_sample == previous_i_sample:
-                info = "{:d}: ({:.0f} and {:.0f}).\n".format(
-                    i_sample, event_classes[i_event - 1], event_classes[i_event]
-                )
-                warnings.warn(
-                    "Same sample has at least two markers.\n"
-                    + info
-                    + "Marker codes will be summed."
-                )
-            previous_i_sample = i_sample
+        i_events_dup = np.flatnonzero(np.diff(event_times_in_samples) == 0) + 1
+        for i_event in i_events_dup:
+            info = "{:d}: ({:.0f} and {:.0f}).\n".format(
+                event_times_in_samples[i_event],
+                event_classes[i_event - 1],
+                event_classes[i_event],
+            )
+            warnings.warn(
+                "Same sample has at least two markers.\n"
+                + info
+                + "Marker codes will be summed."
+            )
 
-        # Now create stim chan
-        stim_chan = np.zeros_like(cnt.get_data()[0])
-        for i_sample, id_class in zip(event_times_in_samples, event_classes):
-            stim_chan[i_sample] += id_class
+        # Now create stim chan, unbuffered add sums codes on shared samples
+        stim_chan = np.zeros(cnt.n_times, dtype=np.float64)
+        np.add.at(stim_chan, event_times_in_samples, event_classes)
         info = mne.create_info(
             ch_names=["STI 014"], sfreq=cnt.info["sfreq"], ch_types=["stim"]
         )
         stim_cnt = mne.io.RawArray(stim_chan[None], info, verbose="WARNING")
         cnt = cnt.add_channels([stim_cnt])
-        event_arr = [
-            event_times_in_samples,
-            [0] * len(event_times_in_samples),
-            event_classes,
-        ]
-        # cnt.info["events"] = np.array(event_arr).T
         mapping = {
             0: "left",
             1: "right",
             2: "rest",
             3: "foot",
         }
-        annot_from_events = mne.annotations_from_events(
-            events=np.array(event_arr).T,
-            event_desc=mapping,
-            sfreq=cnt.info["sfreq"],
+        # build the annotations straight from the marker arrays, keeping only
+        # codes in the mapping as annotations_from_events did
+        event_sel = np.isin(event_classes, list(mapping))
+        onsets = event_times_in_samples[event_sel] / cnt.info["sfreq"]
+        annot_from_events = mne.Annotations(
+            onset=onsets,
+            duration=np.zeros_like(onsets),
+            description=[mapping[id_class] for id_class in event_classes[event_sel]],
         )
         cnt.set_annotations(annot_from_events)
         return cnt
@@ -0,0 +1,63 @@
+from .base_tmpl import BaseTmpl
+import numpy as np
+from scipy.sparse import identity, vstack
+from davidbci.brainda.algorithms.decomposition import FBTRCA
+from davidbci.brainda.algorithms.decomposition.cca import _ged_wong, _trca_kernel
+from davidbci.brainda.algorithms.decomposition.base import generate_filterbank
+
+
+def make_ssvep(n_trials=12, n_channels=4, n_samples=250, srate=250, seed=0):
+    rng = np.random.RandomState(seed)
+    freqs = [8, 10, 12]
+    t = np.arange(n_samples) / srate
+    y = np.arange(n_trials) % len(freqs)
+    X = rng.randn(n_trials, n_channels, n_samples)
+    for i, label in enumerate(y):
+        X[i] += np.sin(2 * np.pi * freqs[label] * t)
+    return X, y
+
+
+def trca_kernel_block_projection(X):
+    # reference implementation through the (M*N, M*N) block projection
+    M, C, N = X.shape
+    P = vstack([identity(N) for _ in range(M)])
+    P = P @ P.T
+    Z = np.hstack(X).T
+    _, U = _ged_wong(Z, None, P, n_components=C)
+    return U
+
+
+class TestTRCA(BaseTmpl):
+
+    def test_trca_kernel_matches_block_projection(self):
+        X = np.random.RandomState(42).randn(6, 4, 50)
+        U = _trca_kernel(X)
+        U_ref = trca_kernel_block_projection(X)
+        # eigenvectors are only defined up to the sign of each column
+        signs = np.sign(np.sum(U * U_ref, axis=0))
+        np.testing.assert_allclose(U * signs, U_ref, rtol=1e-6, atol=1e-8)
+
+    def test_trca_kernel_float32_input_solved_in_float64(self):
+        X = np.random.RandomState(42).randn(6, 4, 50).astype(np.float32)
+        U = _trca_kernel(X)
+        self.assertEqual(U.dtype, np.float64)
+        np.testing.assert_array_equal(U, _trca_kernel(X.astype(np.float64)))
+
+
+class TestFBTRCA(BaseTmpl):
+
+    def setUp(self):
+        super().setUp()
+        self.X, self.y = make_ssvep()
+        self.filterbank = generate_filterbank(
+            [(6, 40), (14, 40)], [(4, 45), (12, 45)], srate=250, order=4)
+
+    def test_prefiltered_matches_fit_predict(self):
+        est = FBTRCA(self.filterbank, filterweights=np.array([1.0, 0.5]))
+        expected = est.fit(self.X, self.y).predict(self.X)
+
+        est = FBTRCA(self.filterbank, filterweights=np.array([1.0, 0.5]))
+        X_fb = est.transform_filterbank(self.X)
+        labels = est.fit_prefiltered(X_fb, self.y).predict_prefiltered(X_fb)
+        np.testing.assert_array_equal(est.classes_, np.unique(self.y))
+        np.testing.assert_array_equal(expected, labels)
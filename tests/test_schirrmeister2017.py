@@ -0,0 +1,100 @@
+from .base_tmpl import BaseTmpl
+import os
+import tempfile
+import warnings
+import numpy as np
+import h5py
+import mne
+from davidbci.brainda.datasets.schirrmeister2017 import BBCIDataset
+
+EEG_NAMES = [
+    "FP1", "FP2", "F3", "F4", "C3", "C4", "P3", "P4",
+    "O1", "O2", "F7", "F8", "T7", "T8", "P7", "P8",
+]
+# non-EEG sensors, including a label with a char code above 127
+OTHER_NAMES = ["EMG_RH", "BIP1", "GSRµ"]
+SFREQ = 100.0
+N_SAMPLES = 100
+# one duplicated sample (25) and one code (4) outside the annotation mapping
+EVENT_TIMES_MS = [100.0, 250.0, 250.0, 500.0, 700.0]
+EVENT_CLASSES = [1, 2, 3, 4, 2]
+
+
+def write_bbci_file(filename, sensor_names, signal):
+    # mimic the layout of a matlab -v7.3 BBCI file
+    with h5py.File(filename, "w") as h5file:
+        refs = h5file.create_group("#refs#")
+        clab = h5file.create_dataset(
+            "nfo/clab", (1, len(sensor_names)), dtype=h5py.ref_dtype)
+        for i, name in enumerate(sensor_names):
+            codes = np.array([ord(c) for c in name], dtype=np.uint16)[:, None]
+            clab[0, i] = refs.create_dataset("c{:d}".format(i), data=codes).ref
+        h5file["nfo/fs"] = np.array([[SFREQ]])
+        h5file["nfo/T"] = np.array([[float(signal.shape[1])]])
+        for i, chan_signal in enumerate(signal):
+            h5file["ch{:d}".format(i + 1)] = chan_signal[None, :]
+        h5file["mrk/time"] = np.array([EVENT_TIMES_MS])
+        h5file["mrk/event/desc"] = np.array([EVENT_CLASSES], dtype=np.float64)
+
+
+class TestBBCIDataset(BaseTmpl):
+
+    def setUp(self):
+        super().setUp()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, "run.mat")
+        self.sensor_names = EEG_NAMES[:8] + OTHER_NAMES + EEG_NAMES[8:]
+        rng = np.random.RandomState(0)
+        self.signal = rng.randn(len(self.sensor_names), N_SAMPLES) * 50
+        write_bbci_file(self.filename, self.sensor_names, self.signal)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+        super().tearDown()
+
+    def test_get_all_sensors(self):
+        self.assertEqual(
+            self.sensor_names, BBCIDataset.get_all_sensors(self.filename))
+
+    def test_determine_chan_inds_first_occurrence(self):
+        chan_inds = BBCIDataset._determine_chan_inds(["A", "B", "A"], ["B", "A"])
+        self.assertEqual([1, 0], chan_inds)
+
+    def test_load(self):
+        with warnings.catch_warnings(record=True) as records:
+            warnings.simplefilter("always")
+            raw = BBCIDataset(self.filename).load()
+        dup_warnings = [
+            r for r in records if "Same sample has at least two markers" in str(r.message)
+        ]
+        self.assertEqual(1, len(dup_warnings))
+
+        self.assertEqual(EEG_NAMES + ["STI 014"], raw.ch_names)
+        self.assertEqual(SFREQ, raw.info["sfreq"])
+
+        eeg_inds = [self.sensor_names.index(name) for name in EEG_NAMES]
+        np.testing.assert_allclose(
+            raw.get_data(picks=EEG_NAMES),
+            self.signal[eeg_inds] * 1e-6,
+            rtol=1e-6,
+        )
+
+        # codes on the shared sample are summed
+        expected_stim = np.zeros(N_SAMPLES)
+        expected_stim[[10, 25, 50, 70]] = [1, 5, 4, 2]
+        np.testing.assert_array_equal(
+            expected_stim, raw.get_data(picks=["STI 014"])[0])
+
+        # the unmapped code 4 gets no annotation, as with annotations_from_events
+        np.testing.assert_allclose([0.1, 0.25, 0.25, 0.7], raw.annotations.onset)
+        self.assertEqual(
+            ["right", "rest", "foot", "rest"], list(raw.annotations.description))
+        baseline = mne.annotations_from_events(
+            events=np.array(
+                [[10, 0, 1], [25, 0, 2], [25, 0, 3], [50, 0, 4], [70, 0, 2]]),
+            event_desc={0: "left", 1: "right", 2: "rest", 3: "foot"},
+            sfreq=SFREQ,
+        )
+        np.testing.assert_allclose(baseline.onset, raw.annotations.onset)
+        np.testing.assert_array_equal(
+            baseline.description, raw.annotations.description)